@@ -1,17 +1,23 @@
 # app.py
 import streamlit as st
-import fitz  # PyMuPDF
-import json, re, os
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
-from PIL import Image
+import pandas as pd
+import json, re, os, hashlib, threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
 import io
 
 # ---------------------------
 # CONFIG
 # ---------------------------
 STATE_FILE = "progress.json"
+PDF_CACHE_DIR = os.path.join(".cache", "pdf_parse")
+PDF_CACHE_VERSION = 1  # bump whenever read_pdf/clean_lines output changes
+PDF_CACHE_MAX_FILES = 64
 MAX_CONTINUOUS_DAYS = 6
+DATE_LABEL_FORMAT = "%A, %d %b %Y"
+SPECIAL_SUBJECTS = frozenset({"FREE","REVISION","TEST"})
 
 st.set_page_config(page_title="AI Study Planner", layout="wide")
 st.title("📚 AI Study Planner ")
@@ -21,53 +27,102 @@ st.title("📚 AI Study Planner ")
 # ---------------------------
 if "completed" not in st.session_state:
     st.session_state.completed = set()
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE,"r") as f:
+            st.session_state.completed = set(json.load(f))
+if "progress_dirty" not in st.session_state:
+    st.session_state.progress_dirty = False
 if "calendar" not in st.session_state:
     st.session_state.calendar = []
-if "practice_done" not in st.session_state:
-    st.session_state.practice_done = {}
-
-if os.path.exists(STATE_FILE):
-    with open(STATE_FILE,"r") as f:
-        st.session_state.completed = set(json.load(f))
+if "plan_version" not in st.session_state:
+    st.session_state.plan_version = 0
 
 # ---------------------------
 # PDF READER
 # ---------------------------
-def read_pdf(file):
-    """Read PDF text using PyMuPDF, fallback to OCR"""
-    doc = fitz.open(stream=file.read(), filetype="pdf")
+def clean_lines(text):
+    """Split extracted page text into stripped lines, dropping 1-2 character fragments"""
+    return [s for s in (l.strip() for l in text.splitlines()) if len(s)>2]
+
+def read_pdf(data):
+    """Read PDF bytes using PyMuPDF, fallback to OCR"""
+    import fitz  # PyMuPDF; only loaded once a PDF is actually parsed
+    fitz.TOOLS.mupdf_display_errors(False)
+    # Plain text only: skip image blocks and ligature preservation during extraction
+    text_flags = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_IMAGES & ~fitz.TEXT_PRESERVE_LIGATURES
     lines = []
-    for page in doc:
-        text = page.get_text().strip()
-        if text:
-            page_lines = [l.strip() for l in text.split("\n") if len(l.strip())>2]
-        else:
-            pix = page.get_pixmap()
-            img = Image.open(io.BytesIO(pix.tobytes()))
-            import pytesseract
-            ocr_text = pytesseract.image_to_string(img)
-            page_lines = [l.strip() for l in ocr_text.split("\n") if len(l.strip())>2]
-        lines.extend(page_lines)
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for page in doc:
+            text = page.get_text("text", flags=text_flags).strip()
+            if text:
+                page_lines = clean_lines(text)
+            else:
+                pix = page.get_pixmap()
+                from PIL import Image
+                import pytesseract
+                img = Image.open(io.BytesIO(pix.tobytes()))
+                ocr_text = pytesseract.image_to_string(img)
+                page_lines = clean_lines(ocr_text)
+            lines.extend(page_lines)
+    return lines
+
+def prune_pdf_cache():
+    """Delete the least recently used cache files beyond PDF_CACHE_MAX_FILES"""
+    entries = [e for e in os.scandir(PDF_CACHE_DIR) if e.name.endswith(".json")]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for e in entries[PDF_CACHE_MAX_FILES:]:
+        os.remove(e.path)
+
+def read_pdf_cached(data):
+    """Read PDF bytes, reusing the extracted lines cached on disk by content hash"""
+    digest = hashlib.sha1(data).hexdigest()
+    cache_path = os.path.join(PDF_CACHE_DIR, f"v{PDF_CACHE_VERSION}_{digest}.json")
+    try:
+        with open(cache_path,"r") as f:
+            lines = json.load(f)
+    except (OSError, ValueError):
+        lines = None
+    if lines is not None:
+        try:
+            os.utime(cache_path)  # mark as recently used for pruning
+        except OSError:
+            pass
+        return lines
+    lines = read_pdf(data)
+    # The cache is best effort: a read-only or full disk just means no caching
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path,"w") as f:
+            json.dump(lines, f)
+        os.replace(tmp_path, cache_path)
+        prune_pdf_cache()
+    except OSError:
+        pass
     return lines
 
 # ---------------------------
 # HIERARCHY PARSER
 # ---------------------------
-def parse_syllabus_hierarchy(files):
+_UPPER_LETTER_RE = re.compile(r"[A-Z]")
+_SUBJECT_KEYWORD_RE = re.compile(r"(CIVIL|MECHANICAL|ELECTRICAL|BIOLOGY|PHYSICS|CHEMISTRY|MATHEMATICS)", re.I)
+_TOPIC_RE = re.compile(r"^(\d+(\.\d+)?|[A-Z]\.|[IVX]+)\s+")
+
+@st.cache_data(show_spinner=False)
+def parse_syllabus_hierarchy(pdf_blobs):
     """
     Robust hierarchy detection:
     Subject (all caps or contains keywords) → Topic → Subtopic
+    Takes a tuple of PDF bytes so Streamlit caches the result by file content.
     Returns nested dict: subject -> topic -> list[subtopics]
     """
-    syllabus = defaultdict(lambda: defaultdict(list))
-
-    for f in files:
-        temp_path = f"__temp_{f.name}"
-        with open(temp_path, "wb") as out:
-            out.write(f.read())
-        lines = read_pdf(open(temp_path,"rb"))
-        os.remove(temp_path)
+    # Flat (subject, topic) -> subtopics map; nested into plain dicts at the end.
+    # Subtopics are dict keys so repeated lines (headers/footers) dedupe in O(1).
+    sections = {}
 
+    for data in pdf_blobs:
+        lines = read_pdf_cached(data)
         subject = None
         topic = None
 
@@ -77,82 +132,95 @@ def parse_syllabus_hierarchy(files):
                 continue
 
             # SUBJECT detection: all caps OR known keywords
-            if (l.isupper() and len(l.split()) <= 6 and re.search(r"[A-Z]", l)) \
-                or re.search(r"(CIVIL|MECHANICAL|ELECTRICAL|BIOLOGY|PHYSICS|CHEMISTRY|MATHEMATICS)", l, re.I):
+            if (l.isupper() and len(l.split()) <= 6 and _UPPER_LETTER_RE.search(l)) \
+                or _SUBJECT_KEYWORD_RE.search(l):
                 subject = l.title()
                 topic = None
                 continue
 
             # TOPIC detection: title case or numbered
-            if re.match(r"^(\d+(\.\d+)?|[A-Z]\.|[IVX]+)\s+", l) or l.istitle():
+            if _TOPIC_RE.match(l) or l.istitle():
                 topic = l
                 continue
 
             # Otherwise subtopic
             if subject:
-                if topic:
-                    syllabus[subject][topic].append(l)
-                else:
-                    syllabus[subject]["General"].append(l)
+                key = (subject, topic or "General")
             else:
-                syllabus["General"]["General"].append(l)
+                key = ("General", "General")
+            sections.setdefault(key, {})[l] = None
 
-    if not syllabus:
-        syllabus["General"]["General"] = ["Uploaded syllabus content"]
+    if not sections:
+        sections[("General", "General")] = {"Uploaded syllabus content": None}
 
-    return dict(syllabus)
+    syllabus = {}
+    for (subject, topic), subtopics in sections.items():
+        syllabus.setdefault(subject, {})[topic] = list(subtopics)
+    return syllabus
 
 # ---------------------------
 # ESTIMATE TIME
 # ---------------------------
+_COMPLEXITY_RE = re.compile(r"theorem|numerical|derivation|proof", re.I)
+
+@lru_cache(maxsize=8192)
 def estimate_time(text):
     words = len(text.split())
-    complexity = len(re.findall(r"(theorem|numerical|derivation|proof)", text.lower()))
+    complexity = len(_COMPLEXITY_RE.findall(text))
     return max(15, words*3 + complexity*10)
 
+# ---------------------------
+# PLAN ITEM
+# ---------------------------
+@dataclass(slots=True)
+class PlanItem:
+    """One subtopic in the queue (time = minutes left) or in a day's plan (time = minutes allotted)"""
+    subject: str
+    topic: str
+    subtopic: str
+    time: int
+    key: str = ""  # completion key, set once the item is placed on a calendar day
+
 # ---------------------------
 # BUILD QUEUE
 # ---------------------------
-def build_queue(syllabus_json, selected_subjects):
-    q = deque()
+@st.cache_data(show_spinner=False)
+def index_syllabus(syllabus_json):
+    """Flatten syllabus to subject -> [(topic, subtopic, minutes)] with times precomputed"""
+    return {
+        subject: [(topic, subtopic, estimate_time(subtopic))
+                  for topic, subtopics in topics.items() for subtopic in subtopics]
+        for subject, topics in syllabus_json.items()
+    }
+
+def build_queue(subtopics_by_subject, selected_subjects):
+    """Per-subject FIFO queues of PlanItems, built once and kept in selection order"""
+    subject_queues = {}
     for subject in selected_subjects:
-        for topic, subtopics in syllabus_json[subject].items():
-            for subtopic in subtopics:
-                q.append({
-                    "subject": subject,
-                    "topic": topic,
-                    "subtopic": subtopic,
-                    "time": estimate_time(subtopic)
-                })
-    return q
+        items = deque(PlanItem(subject, topic, subtopic, minutes)
+                      for topic, subtopic, minutes in subtopics_by_subject[subject])
+        if items:
+            subject_queues[subject] = items
+    return subject_queues
 
 # ---------------------------
 # ASSIGN DAILY PLAN
 # ---------------------------
-def assign_daily_plan(queue, daily_min):
+def assign_daily_plan(subject_queues, daily_min):
+    """Round-robin one day's minutes across subjects; emptied subjects are dropped from subject_queues"""
     plan=[]
-    subjects_today=list({item["subject"] for item in queue})
-    if not subjects_today: return plan
-    subject_queues={s:deque([item for item in queue if item["subject"]==s]) for s in subjects_today}
-
-    while daily_min>0 and any(subject_queues.values()):
-        for s in subjects_today:
-            if not subject_queues[s]: continue
+    while daily_min>0 and subject_queues:
+        for s in list(subject_queues):
             item=subject_queues[s].popleft()
-            alloc=min(item["time"], daily_min)
-            plan.append({
-                "subject": item["subject"],
-                "topic": item["topic"],
-                "subtopic": item["subtopic"],
-                "minutes": alloc
-            })
+            alloc=min(item.time, daily_min)
+            plan.append(PlanItem(item.subject, item.topic, item.subtopic, alloc))
             daily_min -= alloc
-            item["time"] -= alloc
-            if item["time"] <= 0:
-                for idx,q_item in enumerate(queue):
-                    if q_item==item:
-                        del queue[idx]
-                        break
+            item.time -= alloc
+            if item.time > 0:
+                # Only partly scheduled: stays at the head of its subject for the next day
+                subject_queues[s].appendleft(item)
+            elif not subject_queues[s]:
+                del subject_queues[s]
             if daily_min <= 0:
                 break
     return plan
@@ -160,46 +228,60 @@ def assign_daily_plan(queue, daily_min):
 # ---------------------------
 # GENERATE CALENDAR
 # ---------------------------
-def generate_calendar(queue, start_date, daily_hours, revision_every_n_days=7, test_every_n_days=14):
+def generate_calendar(subject_queues, start_date, daily_hours, revision_every_n_days=7, test_every_n_days=14):
     calendar=[]
     streak=0
     day_count=0
-    cur_date=datetime.combine(start_date, datetime.min.time())
+    cur_date=start_date
     daily_min=int(daily_hours*60)
 
-    while queue:
+    while subject_queues:
         day_type="STUDY"
-        plan = assign_daily_plan(queue, daily_min)
+        plan = assign_daily_plan(subject_queues, daily_min)
 
         if streak >= MAX_CONTINUOUS_DAYS:
             day_type="FREE"
-            plan=[{"subject":"FREE","topic":"Rest","subtopic":"Relax / Light revision","minutes":0}]
+            plan=[PlanItem("FREE", "Rest", "Relax / Light revision", 0)]
             streak = 0
         elif day_count % revision_every_n_days == 0 and day_count != 0:
             day_type="REVISION"
-            plan=[{"subject":"REVISION","topic":"Revise Completed","subtopic":"All completed topics","minutes":daily_min}]
+            plan=[PlanItem("REVISION", "Revise Completed", "All completed topics", daily_min)]
         elif day_count % test_every_n_days == 0 and day_count != 0:
             day_type="TEST"
-            plan=[{"subject":"TEST","topic":"Test Completed","subtopic":"All completed topics","minutes":daily_min}]
+            plan=[PlanItem("TEST", "Test Completed", "All completed topics", daily_min)]
 
-        calendar.append({"date": cur_date, "plan": plan, "type": day_type})
+        label = cur_date.strftime(DATE_LABEL_FORMAT)
+        for idx, p in enumerate(plan):
+            p.key = f"{label}_{idx}_{p.subtopic}"
+        calendar.append({"date": cur_date, "label": label, "plan": plan, "type": day_type})
         streak += 1 if day_type=="STUDY" else 0
         day_count += 1
         cur_date += timedelta(days=1)
     return calendar
 
-# ---------------------------
-# STEP 1: CHOOSE SYLLABUS
-# ---------------------------
-st.subheader("📌 Syllabus Selection")
+@st.cache_data(show_spinner=False)
+def schedule_study_days(syllabus_json, selected_subjects, start_date, daily_hours, revision_every_n_days, test_every_n_days):
+    """Build the queue and calendar for one set of inputs; memoized across reruns"""
+    subject_queues = build_queue(index_syllabus(syllabus_json), selected_subjects)
+    calendar = generate_calendar(subject_queues, start_date, daily_hours, revision_every_n_days, test_every_n_days)
+    # Plain tuples, not PlanItems: the cache pickles its value, and PlanItem lives in __main__,
+    # which another session's rerun can redefine mid-pickle
+    for day in calendar:
+        day["plan"] = [(p.subject, p.topic, p.subtopic, p.time, p.key) for p in day["plan"]]
+    return calendar
 
-option = st.radio("Select syllabus type", ["Available Syllabus", "Upload Syllabus (PDF)"])
+def plan_study_calendar(syllabus_json, selected_subjects, start_date, daily_hours, revision_every_n_days, test_every_n_days):
+    """Cached calendar for these inputs, with each day's plan rebuilt as PlanItems"""
+    days = schedule_study_days(syllabus_json, selected_subjects, start_date, daily_hours, revision_every_n_days, test_every_n_days)
+    return [{**day, "plan": [PlanItem(*p) for p in day["plan"]]} for day in days]
 
-syllabus_json = {}
-if option == "Available Syllabus":
-    exam = st.selectbox("Select Exam", ["NEET","GATE","IIT JEE"])
-    # Full default syllabus for multiple subjects per exam
-    default_syllabus = {
+# ---------------------------
+# DEFAULT SYLLABUS
+# ---------------------------
+@st.cache_resource
+def load_default_syllabus():
+    """Full default syllabus for multiple subjects per exam (built once per process)"""
+    return {
         "NEET": {
             "Biology": {"Genetics":["Mendelian laws","DNA structure"], "Anatomy":["Heart","Lungs"]},
             "Chemistry": {"Organic":["Alkanes","Alkenes"], "Inorganic":["Periodic Table","Chemical Bonding"]},
@@ -215,11 +297,22 @@ if option == "Available Syllabus":
             "Mathematics": {"Calculus":["Limits","Differentiation"], "Algebra":["Matrices","Determinants"]}
         }
     }
-    syllabus_json = default_syllabus.get(exam, {})
+
+# ---------------------------
+# STEP 1: CHOOSE SYLLABUS
+# ---------------------------
+st.subheader("📌 Syllabus Selection")
+
+option = st.radio("Select syllabus type", ["Available Syllabus", "Upload Syllabus (PDF)"])
+
+syllabus_json = {}
+if option == "Available Syllabus":
+    exam = st.selectbox("Select Exam", ["NEET","GATE","IIT JEE"])
+    syllabus_json = load_default_syllabus().get(exam, {})
 elif option == "Upload Syllabus (PDF)":
     uploaded_files = st.file_uploader("Upload syllabus PDFs", type=["pdf"], accept_multiple_files=True)
     if uploaded_files:
-        syllabus_json = parse_syllabus_hierarchy(uploaded_files)
+        syllabus_json = parse_syllabus_hierarchy(tuple(f.getvalue() for f in uploaded_files))
     if not syllabus_json:
         st.error("No valid syllabus detected.")
         st.stop()
@@ -229,7 +322,7 @@ elif option == "Upload Syllabus (PDF)":
 # ---------------------------
 subjects = list(syllabus_json.keys())
 selected_subjects = st.multiselect("Select Subjects to study", subjects, default=subjects)
-start_date = st.date_input("Start Date", datetime.today())
+start_date = st.date_input("Start Date", date.today())
 daily_hours = st.number_input("Daily study hours",1.0,12.0,6.0)
 revision_every_n_days = st.number_input("Revision every N days",5,30,7)
 test_every_n_days = st.number_input("Test every N days",7,30,14)
@@ -238,33 +331,75 @@ test_every_n_days = st.number_input("Test every N days",7,30,14)
 # STEP 3: GENERATE PLAN
 # ---------------------------
 if st.button("🚀 Generate Study Plan"):
-    queue = build_queue(syllabus_json, selected_subjects)
-    st.session_state.calendar = generate_calendar(queue, start_date, daily_hours, revision_every_n_days, test_every_n_days)
+    st.session_state.calendar = plan_study_calendar(
+        syllabus_json, tuple(selected_subjects), start_date, daily_hours, revision_every_n_days, test_every_n_days
+    )
+    # New editor keys per plan, so a fresh plan never inherits the old plan's edits
+    st.session_state.plan_version += 1
     st.success("✅ Study plan generated!")
 
 # ---------------------------
 # STEP 4: DISPLAY PLAN
 # ---------------------------
+def apply_done_edits(editor_key, row_keys, rendered_done):
+    """on_change for a day's editor: copy Done cells that differ from what was rendered into the completed set"""
+    completed = st.session_state.completed
+    for row, changes in st.session_state[editor_key]["edited_rows"].items():
+        done = changes.get("Done")
+        if done is None or done == rendered_done[row]:
+            continue
+        if done:
+            completed.add(row_keys[row])
+        else:
+            completed.discard(row_keys[row])
+        st.session_state.progress_dirty = True
+
 if st.session_state.calendar:
     st.subheader("📆 Weekly Study Plan")
-    for day_idx, day in enumerate(st.session_state.calendar):
-        day_label = day['date'].strftime("%A, %d %b %Y")
+    calendar = st.session_state.calendar
+    completed = st.session_state.completed  # plain set; avoids the session-state proxy per row
+    n_weeks = (len(calendar) + 6) // 7
+    # Re-assert the stored week (clamped) so the selector keeps its place when carry-forward adds a week
+    st.session_state.plan_week = min(st.session_state.get("plan_week", 0), n_weeks - 1)
+    week = st.selectbox("Week", range(n_weeks), key="plan_week", format_func=lambda w: f"Week {w + 1}")
+    # Only the selected week is rendered, so widget count stays flat however long the plan is
+    week_start = week * 7
+    for day_idx, day in enumerate(calendar[week_start:week_start + 7], start=week_start):
+        day_label = day["label"]
         st.markdown(f"### {day_label} ({day['type']} DAY)")
-        unfinished_today = []
-
-        for idx, p in enumerate(day["plan"]):
-            if p["subject"] in ["FREE","REVISION","TEST"]:
-                st.markdown(f"- **{p['subject']} → {p['topic']} → {p['subtopic']}**")
+        # One data_editor per day instead of one checkbox widget per subtopic
+        rows = []
+        for p in day["plan"]:
+            if p.subject in SPECIAL_SUBJECTS:
+                st.markdown(f"- **{p.subject} → {p.topic} → {p.subtopic}**")
                 continue
+            rows.append(p)
 
-            key = f"{day_label}_{idx}_{p['subtopic']}"
-            checked = key in st.session_state.completed
-            label = f"**{p['subject']} → {p['topic']} → {p['subtopic']}** ({p['minutes']} min)"
-            if st.checkbox(label, key=key, value=checked):
-                st.session_state.completed.add(key)
-            else:
-                st.session_state.completed.discard(key)
-                unfinished_today.append(p)
+        unfinished_today = []
+        if rows:
+            done_flags = [p.key in completed for p in rows]
+            df = pd.DataFrame({
+                "Subject": [p.subject for p in rows],
+                "Topic": [p.topic for p in rows],
+                "Subtopic": [p.subtopic for p in rows],
+                "Minutes": [p.time for p in rows],
+                "Done": done_flags,
+            })
+            # edited_rows is cumulative for as long as an editor keeps its identity, and Streamlit
+            # versions differ on whether a keyed editor keeps it when only values change. The
+            # rendered Done state is part of the key, so every change yields a fresh editor whose
+            # edited_rows is relative to exactly this df; the callback also skips unchanged cells.
+            editor_key = f"plan_{st.session_state.plan_version}_{day_idx}_" + "".join("1" if d else "0" for d in done_flags)
+            st.data_editor(
+                df,
+                key=editor_key,
+                hide_index=True,
+                disabled=["Subject","Topic","Subtopic","Minutes"],
+                column_config={"Done": st.column_config.CheckboxColumn()},
+                on_change=apply_done_edits,
+                args=(editor_key, [p.key for p in rows], done_flags),
+            )
+            unfinished_today = [p for p in rows if p.key not in completed]
 
         if st.button(f"Mark Day Completed ({day_label})", key=f"complete_day_{day_idx}"):
             if not unfinished_today:
@@ -272,13 +407,23 @@ if st.session_state.calendar:
             else:
                 st.warning(f"{len(unfinished_today)} subtopics unfinished. Carrying forward to next day.")
                 next_idx = day_idx + 1
-                if next_idx >= len(st.session_state.calendar):
+                if next_idx >= len(calendar):
                     next_date = day["date"] + timedelta(days=1)
-                    st.session_state.calendar.append({"date":next_date,"plan":[],"type":"STUDY"})
-                st.session_state.calendar[next_idx]["plan"] = unfinished_today + st.session_state.calendar[next_idx]["plan"]
+                    calendar.append({"date":next_date,"label":next_date.strftime(DATE_LABEL_FORMAT),"plan":[],"type":"STUDY"})
+                next_label = calendar[next_idx]["label"]
+                # Carried copies get their own key, so no completion key is shared by two days' editors
+                carried = [PlanItem(p.subject, p.topic, p.subtopic, p.time, f"{next_label}_{p.key}")
+                           for p in unfinished_today]
+                calendar[next_idx]["plan"] = carried + calendar[next_idx]["plan"]
 
 # ---------------------------
 # SAVE STATE
 # ---------------------------
-with open(STATE_FILE,"w") as f:
-    json.dump(list(st.session_state.completed),f)
+# Only rewrite progress.json after a Done value changed; write-then-rename keeps it intact
+if st.session_state.progress_dirty:
+    # Per-thread temp name: each session's script runs on its own thread in this process
+    tmp_path = f"{STATE_FILE}.{threading.get_ident()}.tmp"
+    with open(tmp_path,"w") as f:
+        json.dump(sorted(st.session_state.completed), f, separators=(",",":"))
+    os.replace(tmp_path, STATE_FILE)
+    st.session_state.progress_dirty = False